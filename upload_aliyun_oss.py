@@ -1,10 +1,188 @@
 import numpy as np
-from PIL import Image
+import torch
+from PIL import Image, ImageFile
 import io
 import os
-import oss2
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+try:
+    import oxipng
+except ImportError:
+    oxipng = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+# 图片格式的文件扩展名
+_IMAGE_EXTS = frozenset({".png", ".jpg", ".jpeg", ".webp"})
+
+# 图像格式对应的文件扩展名
+_FMT_EXT = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+# 图像格式对应的Content-Type
+_IMG_CONTENT_TYPE = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# 根据文件扩展名设置Content-Type
+_CONTENT_TYPE_MAP = {
+    ".mp4": "video/mp4",
+    ".avi": "video/x-msvideo",
+    ".mov": "video/quicktime",
+    ".mkv": "video/x-matroska",
+    ".wmv": "video/x-ms-wmv",
+    ".flv": "video/x-flv",
+    ".webm": "video/webm",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".tiff": "image/tiff",
+    ".tga": "image/x-tga",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+
+# 增大Pillow编码器的分块大小，减少大图写入BytesIO时的分块次数
+_ENCODER_MAXBLOCK = 4 * 1024 * 1024
+if ImageFile.MAXBLOCK < _ENCODER_MAXBLOCK:
+    ImageFile.MAXBLOCK = _ENCODER_MAXBLOCK
+
+
+# 批量上传时同时上传的最大文件数
+_MAX_UPLOAD_WORKERS = 32
+
+# 超过该大小的数据改用分片并发上传
+_MULTIPART_THRESHOLD = 32 * 1024 * 1024
+_MULTIPART_PART_SIZE = 8 * 1024 * 1024
+_MULTIPART_THREADS = 4
+
+# 每个上传线程最多同时发起 _MULTIPART_THREADS 个分片请求，连接池需不小于该值
+_CONNECTION_POOL_SIZE = _MAX_UPLOAD_WORKERS * _MULTIPART_THREADS
+
+# 限制同时编码的图片数量，避免编码线程数超过CPU核数
+_ENCODE_SLOTS = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_bucket(access_key_id, access_key_secret, endpoint, bucket_name):
+    """获取缓存的OSS Bucket，跨调用复用HTTP连接"""
+    import oss2
+
+    auth = oss2.Auth(access_key_id, access_key_secret)
+    session = oss2.Session(pool_size=_CONNECTION_POOL_SIZE)
+    return oss2.Bucket(auth, endpoint, bucket_name, session=session)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_turbojpeg():
+    """获取共享的TurboJPEG编码器，未安装libjpeg-turbo时返回None
+
+    旧版PyTurboJPEG不支持Huffman表优化，此时同样返回None以回退到Pillow，
+    保证输出体积不大于Pillow的结果
+    """
+    if TurboJPEG is None or not hasattr(TurboJPEG, "optimize"):
+        return None
+    try:
+        return TurboJPEG()
+    except (OSError, RuntimeError):
+        return None
+
+
+def _to_uint8_hwc(images):
+    """在张量所在设备上完成归一化和uint8转换，只把uint8数据拷贝回主机
+
+    IMAGE 输入通常为 [0, 1] 范围的float张量；也接受已量化为 [0, 255] 的
+    uint8 张量，此时直接拷贝回主机，不再做缩放和类型转换
+    """
+    if images.dtype == torch.uint8:
+        return images.contiguous().cpu().numpy()
+    return (
+        images.mul(255.0)
+        .round_()
+        .clamp_(0, 255)
+        .to(torch.uint8)
+        .contiguous()
+        .cpu()
+        .numpy()
+    )
+
+
+def _composite_on_white(image_np):
+    """将RGBA/LA uint8数组按alpha通道合成到白色背景上，返回RGB/L uint8数组"""
+    alpha = image_np[..., -1:].astype(np.float32) * (1 / 255.0)
+    color = image_np[..., :-1].astype(np.float32) * alpha + 255.0 * (1.0 - alpha)
+    color = (color + 0.5).astype(np.uint8)
+    # LA合成后只剩灰度通道，去掉通道维度以便构造L模式图像
+    return color[..., 0] if color.shape[-1] == 1 else color
+
+
+class _BufferReader(io.RawIOBase):
+    """以只读文件对象的形式流式读取内存缓冲区，避免复制整个缓冲区"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        size = min(len(b), len(self._view) - self._pos)
+        b[:size] = self._view[self._pos : self._pos + size]
+        self._pos += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = min(max(offset, 0), len(self._view))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def getbuffer(self):
+        return self._view
+
+
+def _put_object(bucket, key, data, content_type):
+    """上传数据到OSS，超过阈值时改用分片并发上传"""
+    headers = {"Content-Type": content_type}
+    if len(data) <= _MULTIPART_THRESHOLD:
+        return bucket.put_object(key, data, headers=headers)
+
+    from oss2.models import PartInfo
+
+    view = data.getbuffer() if isinstance(data, _BufferReader) else memoryview(data)
+    upload_id = bucket.init_multipart_upload(key, headers=headers).upload_id
+
+    def upload_part(part_number):
+        start = (part_number - 1) * _MULTIPART_PART_SIZE
+        part = _BufferReader(view[start : start + _MULTIPART_PART_SIZE])
+        result = bucket.upload_part(key, upload_id, part_number, part)
+        return PartInfo(part_number, result.etag)
+
+    num_parts = -(-len(view) // _MULTIPART_PART_SIZE)
+    try:
+        with ThreadPoolExecutor(max_workers=_MULTIPART_THREADS) as executor:
+            parts = list(executor.map(upload_part, range(1, num_parts + 1)))
+        return bucket.complete_multipart_upload(key, upload_id, parts)
+    except Exception:
+        bucket.abort_multipart_upload(key, upload_id)
+        raise
+
 
 class UploadAliyunOSS:
     @classmethod
@@ -35,6 +213,7 @@ class UploadAliyunOSS:
                     {"default": 95, "min": 1, "max": 100, "step": 1},
                 ),
                 "output_image": ("BOOLEAN", {"default": True}),
+                "png_optimize": ("BOOLEAN", {"default": False}),
             },
         }
 
@@ -59,37 +238,26 @@ class UploadAliyunOSS:
         image_format="PNG",
         jpeg_quality=95,
         output_image=True,
+        png_optimize=False,
     ):
         file_urls_str = ""
 
-        # 参数验证
-        if not access_key_id.strip():
-            print("❌ AccessKey ID 不能为空")
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": ["AccessKey ID 不能为空"]}}
-
-        if not access_key_secret.strip():
-            print("❌ AccessKey Secret 不能为空")
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": ["AccessKey Secret 不能为空"]}}
-
-        if not bucket_name.strip():
-            print("❌ Bucket 名称不能为空")
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": ["Bucket 名称不能为空"]}}
-
-        if not dest_path.strip():
-            print("❌ 目标路径不能为空")
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": ["目标路径不能为空"]}}
+        # 参数验证（去除首尾空白后的值继续用于后续处理）
+        access_key_id = access_key_id.strip()
+        access_key_secret = access_key_secret.strip()
+        bucket_name = bucket_name.strip()
+        dest_path = dest_path.strip()
+        for value, name in (
+            (access_key_id, "AccessKey ID"),
+            (access_key_secret, "AccessKey Secret"),
+            (bucket_name, "Bucket 名称"),
+            (dest_path, "目标路径"),
+        ):
+            if not value:
+                print(f"❌ {name} 不能为空")
+                return self._error_result(
+                    image, file_urls_str, f"{name} 不能为空", output_image
+                )
 
         # 检查是否有输入（图像或文件路径）
         if image is None and (not input_file_path or not input_file_path.strip()):
@@ -97,6 +265,9 @@ class UploadAliyunOSS:
             print(error_msg)
             return {"ui": {"text": [error_msg]}}
 
+        # 延迟导入oss2，避免ComfyUI启动时加载requests及加密相关模块
+        import oss2
+
         try:
             # 检查输入类型
             if input_file_path and input_file_path.strip():
@@ -117,24 +288,7 @@ class UploadAliyunOSS:
                 file_ext = os.path.splitext(input_file_path)[1].lower()
 
                 # 设置Content-Type
-                content_type_map = {
-                    ".mp4": "video/mp4",
-                    ".avi": "video/x-msvideo",
-                    ".mov": "video/quicktime",
-                    ".mkv": "video/x-matroska",
-                    ".wmv": "video/x-ms-wmv",
-                    ".flv": "video/x-flv",
-                    ".webm": "video/webm",
-                    ".gif": "image/gif",
-                    ".bmp": "image/bmp",
-                    ".tiff": "image/tiff",
-                    ".tga": "image/x-tga",
-                    ".png": "image/png",
-                    ".jpg": "image/jpeg",
-                    ".jpeg": "image/jpeg",
-                    ".webp": "image/webp",
-                }
-                upload_content_type = content_type_map.get(
+                upload_content_type = _CONTENT_TYPE_MAP.get(
                     file_ext, "application/octet-stream"
                 )
 
@@ -142,14 +296,13 @@ class UploadAliyunOSS:
                 processed_dest_path = self._process_dest_path(dest_path, image_format)
 
                 # 初始化OSS客户端
-                auth = oss2.Auth(access_key_id, access_key_secret)
-                bucket = oss2.Bucket(auth, endpoint, bucket_name)
+                bucket = _get_bucket(
+                    access_key_id, access_key_secret, endpoint, bucket_name
+                )
 
                 # 上传文件
-                result = bucket.put_object(
-                    processed_dest_path,
-                    upload_data,
-                    headers={"Content-Type": upload_content_type},
+                result = _put_object(
+                    bucket, processed_dest_path, upload_data, upload_content_type
                 )
 
                 if result.status == 200:
@@ -190,103 +343,53 @@ class UploadAliyunOSS:
                     images_to_process = image.unsqueeze(0)
                     num_images = 1
 
+            fmt = image_format.upper()
+
             # 准备目标路径列表
-            dest_paths = self._prepare_dest_paths(dest_path, num_images, image_format)
+            dest_paths = self._prepare_dest_paths(dest_path, num_images, fmt)
 
             # 初始化OSS客户端
-            auth = oss2.Auth(access_key_id, access_key_secret)
-            bucket = oss2.Bucket(auth, endpoint, bucket_name)
+            bucket = _get_bucket(
+                access_key_id, access_key_secret, endpoint, bucket_name
+            )
 
             # 设置Content-Type
-            content_type = {
-                "PNG": "image/png",
-                "JPEG": "image/jpeg",
-                "WEBP": "image/webp",
-            }.get(image_format.upper(), "image/png")
+            content_type = _IMG_CONTENT_TYPE.get(fmt, "image/png")
 
             file_urls = []
             upload_results = []
 
-            # 循环处理每张图片
-            for idx in range(num_images):
-                image_tensor = images_to_process[idx]
-                processed_dest_path = dest_paths[idx]
+            # 一次性将整个批次转换为uint8，避免逐张图片的设备同步和类型转换
+            batch_np = _to_uint8_hwc(images_to_process)
 
-                # 检查目标路径是否为图片格式
-                image_extensions = [".png", ".jpg", ".jpeg", ".webp"]
-                current_ext = os.path.splitext(processed_dest_path)[1].lower()
-                is_image_format = current_ext in image_extensions
-
-                if is_image_format:
-                    # 图片格式：进行正常的图片处理
-                    # 将tensor转换为PIL Image
-                    image_np = (image_tensor.cpu().numpy() * 255).astype(np.uint8)
-                    pil_image = Image.fromarray(image_np)
-
-                    # 将图像转换为字节流
-                    image_bytes = io.BytesIO()
-                    if image_format.upper() == "JPEG":
-                        # 如果是JPEG，需要转换为RGB模式（去除alpha通道）
-                        if pil_image.mode in ("RGBA", "LA"):
-                            # 创建白色背景
-                            background = Image.new(
-                                "RGB", pil_image.size, (255, 255, 255)
-                            )
-                            if pil_image.mode == "RGBA":
-                                background.paste(
-                                    pil_image, mask=pil_image.split()[-1]
-                                )  # 使用alpha通道作为遮罩
-                            else:
-                                background.paste(pil_image)
-                            pil_image = background
-                        pil_image.save(
-                            image_bytes,
-                            format="JPEG",
-                            quality=jpeg_quality,
-                            optimize=True,
-                        )
-                    elif image_format.upper() == "WEBP":
-                        pil_image.save(
-                            image_bytes,
-                            format="WEBP",
-                            quality=jpeg_quality,
-                            optimize=True,
+            def encode_and_upload(idx):
+                # 编码后立即上传，使后续图片的编码与先前图片的上传重叠
+                processed_dest_path = dest_paths[idx]
+                with _ENCODE_SLOTS:
+                    upload_data, upload_content_type, is_image_format = (
+                        self._encode_payload(
+                            batch_np[idx],
+                            processed_dest_path,
+                            fmt,
+                            jpeg_quality,
+                            content_type,
+                            png_optimize,
                         )
-                    else:  # PNG
-                        pil_image.save(image_bytes, format="PNG", optimize=True)
-
-                    image_bytes.seek(0)
-                    upload_data = image_bytes.getvalue()
-                    upload_content_type = content_type
-                else:
-                    # 非图片格式：直接使用原始tensor数据
-                    # 将tensor转换为numpy数组并转换为字节
-                    image_np = (image_tensor.cpu().numpy() * 255).astype(np.uint8)
-                    upload_data = image_np.tobytes()
-                    # 根据文件扩展名设置Content-Type
-                    content_type_map = {
-                        ".mp4": "video/mp4",
-                        ".avi": "video/x-msvideo",
-                        ".mov": "video/quicktime",
-                        ".mkv": "video/x-matroska",
-                        ".wmv": "video/x-ms-wmv",
-                        ".flv": "video/x-flv",
-                        ".webm": "video/webm",
-                        ".gif": "image/gif",
-                        ".bmp": "image/bmp",
-                        ".tiff": "image/tiff",
-                        ".tga": "image/x-tga",
-                    }
-                    upload_content_type = content_type_map.get(
-                        current_ext, "application/octet-stream"
                     )
-
-                # 上传文件
-                result = bucket.put_object(
-                    processed_dest_path,
-                    upload_data,
-                    headers={"Content-Type": upload_content_type},
+                result = _put_object(
+                    bucket, processed_dest_path, upload_data, upload_content_type
                 )
+                # 只保留数据大小，避免整个批次的编码结果驻留内存
+                return processed_dest_path, len(upload_data), is_image_format, result
+
+            # 并发编码并上传所有文件（Pillow编码和网络IO都会释放GIL）
+            max_workers = max(1, min(num_images, _MAX_UPLOAD_WORKERS))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(executor.map(encode_and_upload, range(num_images)))
+
+            # 按原始顺序汇总上传结果
+            for idx, outcome in enumerate(outcomes):
+                processed_dest_path, data_size, is_image_format, result = outcome
 
                 if result.status == 200:
                     file_type = "图像" if is_image_format else "文件"
@@ -298,7 +401,7 @@ class UploadAliyunOSS:
                         endpoint, bucket_name, processed_dest_path
                     )
                     file_urls.append(file_url)
-                    print(f"📊 文件大小: {len(upload_data)} bytes")
+                    print(f"📊 文件大小: {data_size} bytes")
                     upload_results.append(f"上传成功: {processed_dest_path}")
                 else:
                     file_type = "图像" if is_image_format else "文件"
@@ -324,48 +427,138 @@ class UploadAliyunOSS:
         except oss2.exceptions.AccessDenied:
             error_msg = "❌ 访问被拒绝，请检查 AccessKey 权限"
             print(error_msg)
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": [error_msg]}}
+            return self._error_result(image, file_urls_str, error_msg, output_image)
         except oss2.exceptions.NoSuchBucket:
             error_msg = "❌ 存储桶不存在，请检查 bucket_name"
             print(error_msg)
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": [error_msg]}}
+            return self._error_result(image, file_urls_str, error_msg, output_image)
         except oss2.exceptions.InvalidAccessKeyId:
             error_msg = "❌ 无效的 AccessKey ID"
             print(error_msg)
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": [error_msg]}}
+            return self._error_result(image, file_urls_str, error_msg, output_image)
         except oss2.exceptions.SignatureDoesNotMatch:
             error_msg = "❌ 签名不匹配，请检查 AccessKey Secret"
             print(error_msg)
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": [error_msg]}}
+            return self._error_result(image, file_urls_str, error_msg, output_image)
         except oss2.exceptions.OssError as e:
             error_msg = f"❌ OSS错误: {e}"
             print(error_msg)
-            if output_image and image is not None:
-                return (image, file_urls_str)
-            else:
-                return {"ui": {"text": [error_msg]}}
+            return self._error_result(image, file_urls_str, error_msg, output_image)
         except Exception as e:
             error_msg = f"❌ 上传OSS时发生未知错误: {str(e)}"
             print(error_msg)
             import traceback
 
             traceback.print_exc()
-            if output_image and image is not None:
-                return (image, file_urls_str)
+            return self._error_result(image, file_urls_str, error_msg, output_image)
+
+    def _error_result(self, image, file_urls_str, error_msg, output_image):
+        """生成出错时的返回值：有图像输出时原样返回图像，否则在界面显示错误信息"""
+        if output_image and image is not None:
+            return (image, file_urls_str)
+        else:
+            return {"ui": {"text": [error_msg]}}
+
+    def _encode_payload(
+        self,
+        image_np,
+        dest_path,
+        image_format,
+        jpeg_quality,
+        content_type,
+        png_optimize=False,
+    ):
+        """将uint8图像数组编码为上传数据，返回 (数据, Content-Type, 是否为图片格式)
+
+        image_format 需为大写格式名（PNG/JPEG/WEBP）
+        """
+        # 检查目标路径是否为图片格式
+        current_ext = os.path.splitext(dest_path)[1].lower()
+        is_image_format = current_ext in _IMAGE_EXTS
+
+        if not is_image_format:
+            # 非图片格式：直接流式上传原始像素数据，不复制整个数组
+            upload_data = _BufferReader(np.ascontiguousarray(image_np))
+            # 根据文件扩展名设置Content-Type
+            upload_content_type = _CONTENT_TYPE_MAP.get(
+                current_ext, "application/octet-stream"
+            )
+            return upload_data, upload_content_type, is_image_format
+
+        if (
+            image_format == "JPEG"
+            and image_np.ndim == 3
+            and image_np.shape[2] in (2, 4)
+        ):
+            # JPEG不支持alpha通道，直接用numpy合成到白色背景上
+            image_np = _composite_on_white(image_np)
+
+        # JPEG优先使用libjpeg-turbo直接编码numpy数组，采样方式与Pillow一致（4:2:0）
+        if image_format == "JPEG" and image_np.ndim == 3:
+            turbo_jpeg = _get_turbojpeg()
+            if turbo_jpeg is not None and image_np.shape[2] == 3:
+                upload_data = turbo_jpeg.encode(
+                    np.ascontiguousarray(image_np),
+                    quality=jpeg_quality,
+                    pixel_format=TJPF_RGB,
+                    jpeg_subsample=TJSAMP_420,
+                )
+                # 与Pillow的optimize=True一致，无损优化Huffman表以减小体积
+                upload_data = turbo_jpeg.optimize(upload_data)
+                return upload_data, content_type, is_image_format
+
+        # 图片格式：进行正常的图片处理
+        if image_np.ndim == 3 and image_np.shape[2] in (3, 4):
+            # RGB/RGBA按已知模式直接构造PIL图像，跳过fromarray的模式推断
+            # （仅RGBA能直接映射numpy内存，RGB仍会复制一次）
+            height, width, channels = image_np.shape
+            mode = "RGB" if channels == 3 else "RGBA"
+            pil_image = Image.frombuffer(
+                mode,
+                (width, height),
+                np.ascontiguousarray(image_np),
+                "raw",
+                mode,
+                0,
+                1,
+            )
+        else:
+            pil_image = Image.fromarray(image_np)
+
+        # 将图像转换为字节流
+        image_bytes = io.BytesIO()
+        if image_format == "JPEG":
+            # alpha通道已在上面合成到白色背景，无需再拆分通道
+            pil_image.save(
+                image_bytes,
+                format="JPEG",
+                quality=jpeg_quality,
+                optimize=True,
+            )
+        elif image_format == "WEBP":
+            pil_image.save(
+                image_bytes,
+                format="WEBP",
+                quality=jpeg_quality,
+                optimize=True,
+            )
+        else:  # PNG
+            if png_optimize and oxipng is None:
+                # 未安装oxipng时回退到Pillow的optimize
+                pil_image.save(image_bytes, format="PNG", optimize=True)
             else:
-                return {"ui": {"text": [error_msg]}}
+                pil_image.save(image_bytes, format="PNG", compress_level=6)
+                if png_optimize:
+                    # 使用oxipng进一步压缩，速度与Pillow的optimize相当但体积更小
+                    return (
+                        oxipng.optimize_from_memory(image_bytes.getvalue(), level=2),
+                        content_type,
+                        is_image_format,
+                    )
+
+        # 直接流式读取编码缓冲区，不再额外复制一份bytes
+        upload_data = _BufferReader(image_bytes.getbuffer())
+        return upload_data, content_type, is_image_format
 
     def _prepare_dest_paths(self, dest_path_input, num_images, image_format):
         """准备目标路径列表，支持多路径按换行符分割"""
@@ -384,13 +577,12 @@ class UploadAliyunOSS:
             # 如果路径数量 < 图片数量，使用最后一个路径并添加后缀
             result_paths = dest_paths.copy()
             last_path = dest_paths[-1]
+            path_without_ext, ext = os.path.splitext(last_path)
 
             # 为剩余的图片生成路径
             for i in range(len(dest_paths), num_images):
                 suffix_index = i - len(dest_paths)
                 # 在文件名（扩展名前）添加后缀
-                path_without_ext = os.path.splitext(last_path)[0]
-                ext = os.path.splitext(last_path)[1]
                 if not ext:
                     # 如果没有扩展名，后面会自动添加
                     new_path = f"{path_without_ext}-{suffix_index}"
@@ -398,42 +590,53 @@ class UploadAliyunOSS:
                     new_path = f"{path_without_ext}-{suffix_index}{ext}"
                 result_paths.append(new_path)
 
+        # 整个批次共用同一个时间戳
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
         # 处理每个路径
         processed_paths = []
-        for path in result_paths:
-            processed_path = self._process_dest_path(path, image_format)
+        seen_paths = set()
+        for idx, path in enumerate(result_paths):
+            processed_path = self._process_dest_path(path, image_format, timestamp)
+            if "{timestamp}" in path and processed_path in seen_paths:
+                # 多个时间戳模板展开后重复时，在扩展名前添加序号保证唯一
+                path_without_ext, ext = os.path.splitext(processed_path)
+                processed_path = f"{path_without_ext}-{idx}{ext}"
+            seen_paths.add(processed_path)
             processed_paths.append(processed_path)
 
         return processed_paths
 
-    def _process_dest_path(self, dest_path, image_format):
+    def _process_dest_path(self, dest_path, image_format, timestamp=None):
         """处理目标路径，替换占位符和确保正确的文件扩展名"""
         # 处理时间戳占位符
         if "{timestamp}" in dest_path:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            if timestamp is None:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             dest_path = dest_path.replace("{timestamp}", timestamp)
 
         # 检查是否为图片格式的扩展名
-        image_extensions = [".png", ".jpg", ".jpeg", ".webp"]
-        current_ext = os.path.splitext(dest_path)[1].lower()
+        path_without_ext, current_ext = os.path.splitext(dest_path)
+        current_ext = current_ext.lower()
 
         # 如果不是图片格式的扩展名，直接使用原始路径
-        if current_ext and current_ext not in image_extensions:
+        if current_ext and current_ext not in _IMAGE_EXTS:
             # 移除开头的斜杠（OSS不需要）
             dest_path = dest_path.lstrip("/")
             return dest_path
 
         # 确保文件扩展名正确（仅对图片格式）
-        file_ext = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}.get(
-            image_format.upper(), ".png"
-        )
+        file_ext = _FMT_EXT.get(image_format.upper(), ".png")
 
         # 如果路径没有扩展名或扩展名不匹配，添加正确的扩展名
-        if not any(dest_path.lower().endswith(ext) for ext in image_extensions):
-            dest_path += file_ext
-        elif not dest_path.lower().endswith(file_ext.lower()):
+        # （以点开头的文件名如 ".png" 没有扩展名，需按后缀判断）
+        if dest_path.lower().endswith(file_ext):
+            pass
+        elif current_ext:
             # 替换现有扩展名
-            dest_path = os.path.splitext(dest_path)[0] + file_ext
+            dest_path = path_without_ext + file_ext
+        else:
+            dest_path += file_ext
 
         # 移除开头的斜杠（OSS不需要）
         dest_path = dest_path.lstrip("/")